@@ -1,15 +1,24 @@
 from __future__ import annotations
 
-import copy
 import enum
 import logging
+import operator
 from collections import defaultdict
-from typing import TYPE_CHECKING, Hashable, Iterable
+from typing import (
+    TYPE_CHECKING,
+    AbstractSet,
+    Any,
+    Hashable,
+    Iterable,
+    NamedTuple,
+)
 
 import networkx as nx
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components
 
 if TYPE_CHECKING:
-    import numpy as np
     from networkx.classes.reportviews import NodeView, OutEdgeView
 
 logger = logging.getLogger(__name__)
@@ -54,7 +63,7 @@ class NodeFlag(str, enum.Enum):
             bool: True if the value is already in the enum's values,
                 false otherwise
         """
-        return value in cls.__members__.values()
+        return value in _NODE_FLAGS
 
 
 @enum.unique
@@ -77,6 +86,146 @@ class EdgeFlag(str, enum.Enum):
     WRONG_SEMANTIC = "is_wrong_semantic"
 
 
+# Sets of all flags for O(1) membership checks against node and edge attributes
+_NODE_FLAGS = frozenset(NodeFlag)
+_EDGE_FLAGS = frozenset(EdgeFlag)
+
+# Returned for frames without nodes so that queries never insert into nodes_by_frame
+_EMPTY_FROZENSET: frozenset[Hashable] = frozenset()
+
+
+class _CSRTopology(NamedTuple):
+    """Dense node index and compressed sparse row (CSR) arrays of a graph topology.
+
+    Nodes are assigned dense integer indices in the order of the graph nodes.
+    The successors of the node with index i are
+    out_indices[out_indptr[i]:out_indptr[i + 1]], and the predecessors are
+    stored in the same way in in_indptr and in_indices.
+    """
+
+    # index -> node id
+    node_ids: list[Hashable]
+    # node id -> index
+    node_index: dict[Hashable, int]
+    out_indptr: np.ndarray
+    out_indices: np.ndarray
+    in_indptr: np.ndarray
+    in_indices: np.ndarray
+
+
+def _index_nodes_by_frame(
+    graph: nx.DiGraph, frame_key: str, location_keys: tuple[str, ...]
+) -> defaultdict[int, set[Hashable]]:
+    """Group the nodes of a graph by frame, checking that every node has the time
+    frame and location specified.
+
+    Args:
+        graph (nx.DiGraph): The graph to index
+        frame_key (str): The node attribute containing the frame of the node
+        location_keys (tuple[str, ...]): The node attributes containing the
+            location of the node
+
+    Returns:
+        defaultdict[int, set[Hashable]]: Mapping from frame to the ids of all
+            nodes in that frame.
+
+    Raises:
+        AssertionError if a node is missing the frame key or a location key.
+    """
+    nodes_by_frame: defaultdict[int, set[Hashable]] = defaultdict(set)
+    for node, attrs in graph._node.items():
+        try:
+            frame = attrs[frame_key]
+        except KeyError:
+            raise AssertionError(
+                f"Frame key {frame_key} not present for node {node}."
+            ) from None
+        for key in location_keys:
+            assert key in attrs, f"Location key {key} not present for node {node}."
+        nodes_by_frame[frame].add(node)
+    return nodes_by_frame
+
+
+def _index_flags(
+    graph: nx.DiGraph,
+) -> tuple[
+    dict[NodeFlag, set[Hashable]], dict[EdgeFlag, set[tuple[Hashable, Hashable]]]
+]:
+    """Find the nodes and edges of a graph that have each flag set to True.
+
+    Only the attributes actually present on each node and edge are visited.
+
+    Args:
+        graph (nx.DiGraph): The graph to index
+
+    Returns:
+        tuple[dict, dict]: Mappings from each NodeFlag to the flagged node ids
+            and from each EdgeFlag to the flagged edge ids.
+    """
+    nodes_by_flag: dict[NodeFlag, set[Hashable]] = {flag: set() for flag in NodeFlag}
+    edges_by_flag: dict[EdgeFlag, set[tuple[Hashable, Hashable]]] = {
+        flag: set() for flag in EdgeFlag
+    }
+    node_flags = _NODE_FLAGS
+    edge_flags = _EDGE_FLAGS
+    for node, attrs in graph._node.items():
+        for key, value in attrs.items():
+            if key in node_flags and value:
+                nodes_by_flag[key].add(node)
+    # read the adjacency dict directly rather than building edge tuples for
+    # every edge through graph.edges
+    for source, targets in graph._succ.items():
+        for target, attrs in targets.items():
+            for key, value in attrs.items():
+                if key in edge_flags and value:
+                    edges_by_flag[key].add((source, target))
+    return nodes_by_flag, edges_by_flag
+
+
+def _adjacency_to_csr(
+    adj: dict[Hashable, dict[Hashable, dict]], node_index: dict[Hashable, int]
+) -> tuple[np.ndarray, np.ndarray]:
+    """Convert a networkx adjacency dict (e.g. DiGraph._succ) into CSR arrays.
+
+    Args:
+        adj (dict): Mapping from each node id to a dict keyed by its neighbors.
+            Must iterate over nodes in the same order as node_index.
+        node_index (dict): Mapping from node id to dense integer index.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: The row pointer array of length
+            len(adj) + 1 and the column index array with one entry per edge.
+    """
+    indptr = np.zeros(len(adj) + 1, dtype=np.int32)
+    np.cumsum(
+        np.fromiter(
+            (len(nbrs) for nbrs in adj.values()), dtype=np.int32, count=len(adj)
+        ),
+        out=indptr[1:],
+    )
+    indices = np.fromiter(
+        (node_index[nbr] for nbrs in adj.values() for nbr in nbrs),
+        dtype=np.int32,
+        count=indptr[-1],
+    )
+    return indptr, indices
+
+
+def _group_by_label(labels: np.ndarray) -> list[np.ndarray]:
+    """Group the indices of an array of integer labels by label value.
+
+    Args:
+        labels (np.ndarray): 1D array with a label for each index
+
+    Returns:
+        list[np.ndarray]: One array of indices per unique label, in
+            increasing label order.
+    """
+    order = np.argsort(labels, kind="stable")
+    boundaries = np.flatnonzero(np.diff(labels[order])) + 1
+    return np.split(order, boundaries)
+
+
 class TrackingGraph:
     """A directed graph representing a tracking solution where edges go forward in time.
 
@@ -98,8 +247,9 @@ class TrackingGraph:
         start_frame: int, the first frame with a node in the graph
         end_frame: int, the end of the span of frames containing nodes
             (one frame after the last frame that contains a node)
-        nodes_by_frame: dict of int -> node_id
-            Maps from frames to all node ids in that frame
+        nodes_by_frame: defaultdict of int -> set of node_id
+            Maps from frames to all node ids in that frame. Frames without
+            nodes map to an empty set.
         frame_key: str
             The name of the node attribute that corresponds to the frame of
             the node. Defaults to "t".
@@ -165,58 +315,145 @@ class TrackingGraph:
                     "annotation. Please change the location key."
                 )
         self.location_keys = location_keys
+        # itemgetter rather than a closure, so that TrackingGraphs stay picklable
+        self._location_getter = (
+            operator.itemgetter(*location_keys) if location_keys else None
+        )
         self.name = name
 
         self.graph = graph
 
         # construct dictionaries from attributes to nodes/edges for easy lookup
-        self.nodes_by_frame: defaultdict[int, set[Hashable]] = defaultdict(set)
-        self.nodes_by_flag: dict[NodeFlag, set[Hashable]] = {
-            flag: set() for flag in NodeFlag
-        }
-        self.edges_by_flag: dict[EdgeFlag, set[tuple[Hashable, Hashable]]] = {
-            flag: set() for flag in EdgeFlag
-        }
-        for node, attrs in self.graph.nodes.items():
-            # check that every node has the time frame and location specified
-            assert (
-                self.frame_key in attrs.keys()
-            ), f"Frame key {self.frame_key} not present for node {node}."
-            for key in self.location_keys:
-                assert (
-                    key in attrs.keys()
-                ), f"Location key {key} not present for node {node}."
-
-            # store node id in nodes_by_frame mapping
-            frame = attrs[self.frame_key]
-            if frame not in self.nodes_by_frame.keys():
-                self.nodes_by_frame[frame] = {node}
-            else:
-                self.nodes_by_frame[frame].add(node)
-            # store node id in nodes_by_flag mapping
-            for node_flag in NodeFlag:
-                if attrs.get(node_flag):
-                    self.nodes_by_flag[node_flag].add(node)
-
-        # store edge id in edges_by_flag
-        for edge, attrs in self.graph.edges.items():
-            for edge_flag in EdgeFlag:
-                if attrs.get(edge_flag):
-                    self.edges_by_flag[edge_flag].add(edge)
+        self.nodes_by_frame = _index_nodes_by_frame(
+            self.graph, self.frame_key, self.location_keys
+        )
+        # the flag lookups are built on first access, see _ensure_flag_index
+        self._nodes_by_flag: dict[NodeFlag, set[Hashable]] | None = None
+        self._edges_by_flag: dict[EdgeFlag, set[tuple[Hashable, Hashable]]] | None = (
+            None
+        )
 
         # Store first and last frames for reference
         if len(self.nodes_by_frame) == 0:
             self.start_frame = None
             self.end_frame = None
         else:
-            self.start_frame = min(self.nodes_by_frame.keys())
-            self.end_frame = max(self.nodes_by_frame.keys()) + 1
+            self.start_frame = min(self.nodes_by_frame)
+            self.end_frame = max(self.nodes_by_frame) + 1
 
         # Record types of annotations that have been calculated
         self.division_annotations = False
         self.node_errors = False
         self.edge_errors = False
 
+        # Lazily computed results of topology queries
+        self._invalidate_topology_cache()
+
+    def __getstate__(self) -> dict[str, Any]:
+        """Drop the cached topology arrays when copying or pickling.
+
+        Copies rebuild the caches lazily, so the read-only arrays are never
+        shared with or turned writable by copy.deepcopy or pickle.
+        """
+        state = self.__dict__.copy()
+        for attr in (
+            "_divisions_cache",
+            "_merges_cache",
+            "_csr",
+            "_locations",
+            "_frame_indptr",
+            "_frame_nodes",
+        ):
+            state[attr] = None
+        return state
+
+    def _invalidate_topology_cache(self) -> None:
+        """Clear cached results of queries that depend on the graph structure.
+
+        Must be called whenever nodes or edges are added to or removed from
+        self.graph.
+        """
+        self._divisions_cache: list[Hashable] | None = None
+        self._merges_cache: list[Hashable] | None = None
+        # Dense node index and CSR arrays of the topology, see _ensure_csr
+        self._csr: _CSRTopology | None = None
+        # Array of node locations aligned with the dense node index
+        self._locations: np.ndarray | None = None
+        # Dense node indices sorted by frame, see _ensure_frame_index
+        self._frame_indptr: np.ndarray | None = None
+        self._frame_nodes: np.ndarray | None = None
+
+    def _ensure_csr(self) -> _CSRTopology:
+        """Get the compressed sparse row (CSR) arrays of the graph topology,
+        building them if they do not exist yet.
+
+        Returns:
+            _CSRTopology: The dense node index and CSR arrays of self.graph, with
+                nodes indexed in the order of self.graph.nodes.
+        """
+        if self._csr is not None:
+            return self._csr
+        node_ids = list(self.graph._succ)
+        node_index = {node: i for i, node in enumerate(node_ids)}
+        out_indptr, out_indices = _adjacency_to_csr(self.graph._succ, node_index)
+        in_indptr, in_indices = _adjacency_to_csr(self.graph._pred, node_index)
+        self._csr = _CSRTopology(
+            node_ids, node_index, out_indptr, out_indices, in_indptr, in_indices
+        )
+        return self._csr
+
+    def _ensure_flag_index(
+        self,
+    ) -> tuple[
+        dict[NodeFlag, set[Hashable]], dict[EdgeFlag, set[tuple[Hashable, Hashable]]]
+    ]:
+        """Get the mappings from node and edge flags to the nodes and edges
+        that have the flag set to True, building them if they do not exist yet.
+
+        Graphs that are never annotated or queried by flag skip this scan entirely.
+
+        Returns:
+            tuple[dict, dict]: The nodes_by_flag and edges_by_flag mappings.
+        """
+        nodes_by_flag = self._nodes_by_flag
+        edges_by_flag = self._edges_by_flag
+        if nodes_by_flag is None or edges_by_flag is None:
+            # Keep a mapping that was assigned directly through its setter
+            indexed_nodes, indexed_edges = _index_flags(self.graph)
+            if nodes_by_flag is None:
+                nodes_by_flag = self._nodes_by_flag = indexed_nodes
+            if edges_by_flag is None:
+                edges_by_flag = self._edges_by_flag = indexed_edges
+        return nodes_by_flag, edges_by_flag
+
+    @property
+    def nodes_by_flag(self) -> dict[NodeFlag, set[Hashable]]:
+        """Mapping from each NodeFlag to the set of node ids with the flag set to True.
+
+        Built from the node attributes on first access, so flags written directly
+        to the networkx graph before then are included.
+        """
+        return self._ensure_flag_index()[0]
+
+    @nodes_by_flag.setter
+    def nodes_by_flag(self, value: dict[NodeFlag, set[Hashable]]) -> None:
+        self._nodes_by_flag = value
+
+    @property
+    def edges_by_flag(self) -> dict[EdgeFlag, set[tuple[Hashable, Hashable]]]:
+        """Mapping from each EdgeFlag to the set of edge ids with the flag set to True.
+
+        Built from the edge attributes on first access, so flags written directly
+        to the networkx graph before then are included.
+        """
+        return self._ensure_flag_index()[1]
+
+    @edges_by_flag.setter
+    def edges_by_flag(
+        self, value: dict[EdgeFlag, set[tuple[Hashable, Hashable]]]
+    ) -> None:
+        self._edges_by_flag = value
+
     @property
     def nodes(self) -> NodeView:
         """Get all the nodes in the graph, along with their attributes.
@@ -236,6 +473,83 @@ class TrackingGraph:
         """
         return self.graph.edges
 
+    def _ensure_frame_index(self) -> tuple[np.ndarray, np.ndarray]:
+        """Get CSR-like arrays grouping the dense node indices by frame, building
+        them if they do not exist yet.
+
+        The indices of the nodes in frame t are
+        frame_nodes[frame_indptr[t - s]:frame_indptr[t - s + 1]],
+        where s is self.start_frame.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: The frame row pointer array and the
+                read-only array of node indices sorted by frame.
+        """
+        if self._frame_indptr is not None and self._frame_nodes is not None:
+            return self._frame_indptr, self._frame_nodes
+        csr = self._ensure_csr()
+        num_nodes = len(csr.node_ids)
+        if num_nodes == 0:
+            frame_indptr = np.zeros(1, dtype=np.int64)
+            frame_nodes = np.zeros(0, dtype=np.int32)
+        else:
+            start_frame = self.start_frame
+            end_frame = self.end_frame
+            assert start_frame is not None and end_frame is not None
+            node_attrs = self.graph._node
+            frame_offsets = (
+                np.fromiter(
+                    (node_attrs[node][self.frame_key] for node in csr.node_ids),
+                    dtype=np.int64,
+                    count=num_nodes,
+                )
+                - start_frame
+            )
+            counts = np.bincount(frame_offsets, minlength=end_frame - start_frame)
+            frame_indptr = np.zeros(len(counts) + 1, dtype=np.int64)
+            np.cumsum(counts, out=frame_indptr[1:])
+            frame_nodes = np.argsort(frame_offsets, kind="stable").astype(np.int32)
+        frame_nodes.flags.writeable = False
+        self._frame_indptr = frame_indptr
+        self._frame_nodes = frame_nodes
+        return frame_indptr, frame_nodes
+
+    def get_node_indices_in_frame(self, frame: int) -> np.ndarray:
+        """Get the positions of all nodes in the given frame within the node order of
+        self.graph.nodes, i.e. their rows in self.locations.
+
+        This allows vectorized per-frame operations, e.g.
+        graph.locations[graph.get_node_indices_in_frame(t)] gives the locations
+        of all nodes in frame t.
+
+        Args:
+            frame (int): The frame number to get the node indices for
+
+        Returns:
+            np.ndarray: Read-only 1D integer array of node indices, in increasing
+                order. Empty if there are no nodes in the frame.
+        """
+        frame_indptr, frame_nodes = self._ensure_frame_index()
+        offset = frame - self.start_frame if self.start_frame is not None else -1
+        if offset < 0 or offset >= len(frame_indptr) - 1:
+            return frame_nodes[:0]
+        return frame_nodes[frame_indptr[offset] : frame_indptr[offset + 1]]
+
+    def get_nodes_in_frame(self, frame: int) -> AbstractSet[Hashable]:
+        """Get the node ids of all nodes in the given frame.
+
+        The returned set is shared storage, not a copy: it is the set stored in
+        self.nodes_by_frame, or a shared empty frozenset if there are no nodes in
+        the frame. Do not modify it; copy it first if you need to.
+
+        Args:
+            frame (int): The frame number to get the nodes for
+
+        Returns:
+            set-like of hashable: The node ids of all nodes in the frame.
+        """
+        return self.nodes_by_frame.get(frame, _EMPTY_FROZENSET)
+
     def get_location(self, node_id: Hashable) -> list[float]:
         """Get the spatial location of the node with node_id using self.location_keys.
 
@@ -245,7 +559,62 @@ class TrackingGraph:
         Returns:
             list of float: A list of location values in the same order as self.location_keys
         """
-        return [self.graph.nodes[node_id][key] for key in self.location_keys]
+        return list(self._location_tuple(self.graph._node[node_id]))
+
+    def _location_tuple(self, attrs: dict[str, Any]) -> tuple[Any, ...]:
+        """Extract the location values from a node attribute dict.
+
+        Args:
+            attrs (dict): The attributes of a node
+
+        Returns:
+            tuple: The location values in the same order as self.location_keys.
+        """
+        if self._location_getter is None:
+            return ()
+        location = self._location_getter(attrs)
+        # itemgetter returns a bare value rather than a tuple for a single key
+        return (location,) if len(self.location_keys) == 1 else location
+
+    @property
+    def locations(self) -> np.ndarray:
+        """Read-only (N, D) array of the locations of all N nodes, with one column
+        for each of the D location keys. Rows follow the order of self.graph.nodes.
+        """
+        locations = self._locations
+        if locations is None:
+            node_ids = self._ensure_csr().node_ids
+            node_attrs = self.graph._node
+            location_tuple = self._location_tuple
+            locations = np.array(
+                [location_tuple(node_attrs[node]) for node in node_ids],
+                dtype=np.float64,
+            ).reshape(len(node_ids), len(self.location_keys))
+            locations.flags.writeable = False
+            self._locations = locations
+        return locations
+
+    def get_location_array(self, ids: Iterable[Hashable] | None = None) -> np.ndarray:
+        """Get the spatial locations of many nodes as a single array, e.g. for
+        vectorized distance computations.
+
+        Args:
+            ids (Iterable[Hashable], optional): The node ids to get the locations of.
+                Defaults to None, which returns the locations of all nodes in the
+                order of self.graph.nodes.
+
+        Returns:
+            np.ndarray: Array of shape (len(ids), len(self.location_keys)) with the
+                location of each node in the same order as ids.
+
+        Raises:
+            KeyError if any of the provided ids is not in the graph.
+        """
+        if ids is None:
+            return self.locations
+        locations = self.locations
+        node_index = self._ensure_csr().node_index
+        return locations[[node_index[_id] for _id in ids]]
 
     def get_nodes_with_flag(self, flag: NodeFlag) -> set[Hashable]:
         """Get all nodes with specified NodeFlag set to True.
@@ -275,13 +644,52 @@ class TrackingGraph:
             raise ValueError(f"Function takes EdgeFlag arguments, not {type(flag)}.")
         return self.edges_by_flag[flag]
 
+    def get_preds(self, node: Hashable) -> list[Hashable]:
+        """Get all predecessors of the given node.
+
+        A predecessor node is any node from a previous time point that has an edge to
+        the given node. In a case where merges are not allowed, each node will have a
+        maximum of one predecessor.
+
+        Args:
+            node (hashable): A node id
+
+        Returns:
+            list of hashable: A list of node ids containing all nodes that
+                have an edge to the given node.
+        """
+        return list(self.graph._pred[node])
+
+    def get_succs(self, node: Hashable) -> list[Hashable]:
+        """Get all successor nodes of the given node.
+
+        A successor node is any node from a later time point that has an edge
+        from the given node. In a case where divisions are not allowed,
+        a node will have a maximum of one successor.
+
+        Args:
+            node (hashable): A node id
+
+        Returns:
+            list of hashable: A list of node ids containing all nodes that have
+                an edge from the given node.
+        """
+        return list(self.graph._succ[node])
+
     def get_divisions(self) -> list[Hashable]:
         """Get all nodes that have at least two edges pointing to the next time frame
 
         Returns:
             list of hashable: a list of node ids for nodes that have more than one child
         """
-        return [node for node, degree in self.graph.out_degree() if degree >= 2]
+        if self._divisions_cache is None:
+            csr = self._ensure_csr()
+            out_degree = np.diff(csr.out_indptr)
+            self._divisions_cache = [
+                csr.node_ids[i] for i in np.flatnonzero(out_degree >= 2)
+            ]
+        # return a copy so that callers can modify the list without corrupting the cache
+        return list(self._divisions_cache)
 
     def get_merges(self) -> list[Hashable]:
         """Get all nodes that have at least two incoming edges from the previous time frame
@@ -289,7 +697,36 @@ class TrackingGraph:
         Returns:
             list of hashable: a list of node ids for nodes that have more than one parent
         """
-        return [node for node, degree in self.graph.in_degree() if degree >= 2]
+        if self._merges_cache is None:
+            csr = self._ensure_csr()
+            in_degree = np.diff(csr.in_indptr)
+            self._merges_cache = [
+                csr.node_ids[i] for i in np.flatnonzero(in_degree >= 2)
+            ]
+        return list(self._merges_cache)
+
+    def _adjacency_matrix(self, edge_mask: np.ndarray) -> csr_matrix:
+        """Build a sparse adjacency matrix from the CSR arrays of the topology.
+
+        Args:
+            edge_mask (np.ndarray): Boolean array aligned with the out_indices of
+                the CSR topology.
+                Only edges where the mask is True are included in the matrix.
+
+        Returns:
+            scipy.sparse.csr_matrix: Square adjacency matrix over the dense
+                node index, with an entry for each (source, target) edge.
+        """
+        csr = self._ensure_csr()
+        num_nodes = len(csr.node_ids)
+        # copy so that eliminating the masked edges does not modify the cached arrays
+        adjacency = csr_matrix(
+            (edge_mask, csr.out_indices, csr.out_indptr),
+            shape=(num_nodes, num_nodes),
+            copy=True,
+        )
+        adjacency.eliminate_zeros()
+        return adjacency
 
     def get_connected_components(self) -> list[TrackingGraph]:
         """Get a list of TrackingGraphs, each corresponding to one track
@@ -298,11 +735,58 @@ class TrackingGraph:
         Returns:
             A list of TrackingGraphs, one for each track.
         """
-        graph = self.graph
-        if len(graph.nodes) == 0:
+        if len(self.graph.nodes) == 0:
             return []
 
-        return [self.get_subgraph(g) for g in nx.weakly_connected_components(graph)]
+        csr = self._ensure_csr()
+        edge_mask = np.ones(len(csr.out_indices), dtype=bool)
+        num_components, labels = connected_components(
+            self._adjacency_matrix(edge_mask), directed=False
+        )
+        node_index = csr.node_index
+
+        # Distribute the frame and flag lookups to the components in a single pass
+        # over the graph, rather than intersecting everything once per component
+        frames_by_comp: list[defaultdict[int, set[Hashable]]] = [
+            defaultdict(set) for _ in range(num_components)
+        ]
+        for node, attrs in self.graph.nodes.items():
+            frames_by_comp[labels[node_index[node]]][attrs[self.frame_key]].add(node)
+
+        node_flags_by_comp: list[dict[NodeFlag, set[Hashable]] | None] = [
+            None
+        ] * num_components
+        edge_flags_by_comp: list[
+            dict[EdgeFlag, set[tuple[Hashable, Hashable]]] | None
+        ] = [None] * num_components
+        nodes_by_flag = self._nodes_by_flag
+        edges_by_flag = self._edges_by_flag
+        if nodes_by_flag is not None and edges_by_flag is not None:
+            comp_nodes_by_flag: list[dict[NodeFlag, set[Hashable]]] = [
+                {flag: set() for flag in NodeFlag} for _ in range(num_components)
+            ]
+            comp_edges_by_flag: list[dict[EdgeFlag, set[tuple[Hashable, Hashable]]]] = [
+                {flag: set() for flag in EdgeFlag} for _ in range(num_components)
+            ]
+            for node_flag, flagged_nodes in nodes_by_flag.items():
+                for node in flagged_nodes:
+                    comp_nodes_by_flag[labels[node_index[node]]][node_flag].add(node)
+            for edge_flag, flagged_edges in edges_by_flag.items():
+                for edge in flagged_edges:
+                    comp_edges_by_flag[labels[node_index[edge[0]]]][edge_flag].add(edge)
+            node_flags_by_comp = list(comp_nodes_by_flag)
+            edge_flags_by_comp = list(comp_edges_by_flag)
+
+        node_ids = csr.node_ids
+        return [
+            self._new_subgraph(
+                self.graph.subgraph([node_ids[i] for i in component]).copy(),
+                frames_by_comp[comp],
+                node_flags_by_comp[comp],
+                edge_flags_by_comp[comp],
+            )
+            for comp, component in enumerate(_group_by_label(labels))
+        ]
 
     def get_subgraph(self, nodes: Iterable[Hashable]) -> TrackingGraph:
         """Returns a new TrackingGraph with the subgraph defined by the list of nodes.
@@ -310,32 +794,92 @@ class TrackingGraph:
         Args:
             nodes (list): A list of node ids to use in constructing the subgraph
         """
+        # Intersecting two sets only iterates over the smaller of the two, so the
+        # flag lookups below cost O(min(len(nodes), len(flagged nodes)))
+        nodes = set(nodes)
         new_graph = self.graph.subgraph(nodes).copy()
 
-        new_trackgraph = copy.deepcopy(self)
-        new_trackgraph.graph = new_graph
-        for frame, nodes_in_frame in self.nodes_by_frame.items():
-            new_nodes_in_frame = nodes_in_frame.intersection(nodes)
-            if new_nodes_in_frame:
-                new_trackgraph.nodes_by_frame[frame] = new_nodes_in_frame
-            else:
-                del new_trackgraph.nodes_by_frame[frame]
-
-        for node_flag in NodeFlag:
-            new_trackgraph.nodes_by_flag[node_flag] = self.nodes_by_flag[
-                node_flag
-            ].intersection(nodes)
-        for edge_flag in EdgeFlag:
-            new_trackgraph.edges_by_flag[edge_flag] = self.edges_by_flag[
-                edge_flag
-            ].intersection(new_trackgraph.edges)
-
-        if len(new_trackgraph.nodes_by_frame) == 0:
+        # only visit the frames of the subgraph nodes rather than every frame
+        nodes_by_frame: defaultdict[int, set[Hashable]] = defaultdict(set)
+        for node, attrs in new_graph.nodes.items():
+            nodes_by_frame[attrs[self.frame_key]].add(node)
+
+        # if the parent flag lookups have not been built yet, the subgraph builds
+        # its own from the copied node and edge attributes when first needed
+        nodes_by_flag: dict[NodeFlag, set[Hashable]] | None = None
+        edges_by_flag: dict[EdgeFlag, set[tuple[Hashable, Hashable]]] | None = None
+        parent_nodes_by_flag = self._nodes_by_flag
+        parent_edges_by_flag = self._edges_by_flag
+        if parent_nodes_by_flag is not None and parent_edges_by_flag is not None:
+            nodes_by_flag = {
+                node_flag: flagged_nodes.intersection(nodes)
+                for node_flag, flagged_nodes in parent_nodes_by_flag.items()
+            }
+            edges_by_flag = {}
+            num_edges = new_graph.number_of_edges()
+            for edge_flag, flagged_edges in parent_edges_by_flag.items():
+                # iterate over whichever of the flagged edges and subgraph edges
+                # is smaller
+                if len(flagged_edges) < num_edges:
+                    edges_by_flag[edge_flag] = {
+                        (u, v) for u, v in flagged_edges if u in nodes and v in nodes
+                    }
+                else:
+                    edges_by_flag[edge_flag] = flagged_edges.intersection(
+                        new_graph.edges
+                    )
+
+        return self._new_subgraph(
+            new_graph, nodes_by_frame, nodes_by_flag, edges_by_flag
+        )
+
+    def _new_subgraph(
+        self,
+        graph: nx.DiGraph,
+        nodes_by_frame: defaultdict[int, set[Hashable]],
+        nodes_by_flag: dict[NodeFlag, set[Hashable]] | None,
+        edges_by_flag: dict[EdgeFlag, set[tuple[Hashable, Hashable]]] | None,
+    ) -> TrackingGraph:
+        """Create a TrackingGraph for a subgraph of self from precomputed lookups.
+
+        The new TrackingGraph is built without calling __init__ or deep copying self,
+        and shares the segmentation and keys of self.
+
+        Args:
+            graph (nx.DiGraph): A copy of the subgraph of self.graph
+            nodes_by_frame (defaultdict): Mapping from frame to the node ids of graph
+                in that frame
+            nodes_by_flag (dict | None): Mapping from each NodeFlag to the flagged
+                node ids of graph, or None to build it lazily
+            edges_by_flag (dict | None): Mapping from each EdgeFlag to the flagged
+                edge ids of graph, or None to build it lazily
+
+        Returns:
+            TrackingGraph: The new TrackingGraph wrapping graph.
+        """
+        new_trackgraph = TrackingGraph.__new__(TrackingGraph)
+        new_trackgraph.segmentation = self.segmentation
+        new_trackgraph.frame_key = self.frame_key
+        new_trackgraph.label_key = self.label_key
+        new_trackgraph.location_keys = self.location_keys
+        new_trackgraph._location_getter = self._location_getter
+        new_trackgraph.name = self.name
+        new_trackgraph.graph = graph
+        new_trackgraph.division_annotations = self.division_annotations
+        new_trackgraph.node_errors = self.node_errors
+        new_trackgraph.edge_errors = self.edge_errors
+        new_trackgraph._invalidate_topology_cache()
+
+        new_trackgraph.nodes_by_frame = nodes_by_frame
+        new_trackgraph._nodes_by_flag = nodes_by_flag
+        new_trackgraph._edges_by_flag = edges_by_flag
+
+        if len(nodes_by_frame) == 0:
             new_trackgraph.start_frame = None
             new_trackgraph.end_frame = None
         else:
-            new_trackgraph.start_frame = min(new_trackgraph.nodes_by_frame.keys())
-            new_trackgraph.end_frame = max(new_trackgraph.nodes_by_frame.keys()) + 1
+            new_trackgraph.start_frame = min(nodes_by_frame)
+            new_trackgraph.end_frame = max(nodes_by_frame) + 1
 
         return new_trackgraph
 
@@ -369,6 +913,37 @@ class TrackingGraph:
         else:
             self.nodes_by_flag[flag].discard(_id)
 
+    def set_flag_on_nodes(
+        self, ids: Iterable[Hashable], flag: NodeFlag, value: bool = True
+    ) -> None:
+        """Set an attribute flag for multiple nodes.
+        If any id is not found in the graph, a KeyError will be raised.
+        If the flag already exists, the existing values will be overwritten.
+
+        Args:
+            ids (Iterable[Hashable]): The node ids on which to set the flag.
+            flag (traccuracy.NodeFlag): The node flag to set. Must be
+                of type NodeFlag - you may not not pass strings, even if they
+                are included in the NodeFlag enum values.
+            value (bool, optional): Flags can only be set to
+                True or False. Defaults to True.
+
+        Raises:
+            KeyError if any of the provided ids is not in the graph.
+            ValueError if the provided flag is not a NodeFlag
+        """
+        if not isinstance(flag, NodeFlag):
+            raise ValueError(
+                f"Provided  flag {flag} is not of type NodeFlag. "
+                "Please use the enum instead of passing string values."
+            )
+        node_attrs = self.graph._node
+        flagged = self.nodes_by_flag[flag]
+        update = flagged.add if value else flagged.discard
+        for _id in ids:
+            node_attrs[_id][flag] = value
+            update(_id)
+
     def set_flag_on_all_nodes(self, flag: NodeFlag, value: bool = True) -> None:
         """Set an attribute flag for all nodes in the graph.
         If the flag already exists, the existing values will be overwritten.
@@ -388,9 +963,11 @@ class TrackingGraph:
                 f"Provided  flag {flag} is not of type NodeFlag. "
                 "Please use the enum instead of passing string values."
             )
-        nx.set_node_attributes(self.graph, value, name=flag)
+        node_attrs = self.graph._node
+        for attrs in node_attrs.values():
+            attrs[flag] = value
         if value:
-            self.nodes_by_flag[flag].update(self.graph.nodes)
+            self.nodes_by_flag[flag] = set(node_attrs)
         else:
             self.nodes_by_flag[flag] = set()
 
@@ -462,24 +1039,28 @@ class TrackingGraph:
 
         """
 
-        graph_copy = self.graph.copy()
+        if len(self.graph.nodes) == 0:
+            return []
 
-        # Remove all intertrack edges from a copy of the original graph
-        removed_edges = []
-        for parent in self.get_divisions():
-            for daughter in self.graph.successors(parent):
-                graph_copy.remove_edge(parent, daughter)
-                removed_edges.append((parent, daughter))
+        # Find connected components of the graph without the intertrack edges,
+        # i.e. without any edge leaving a division
+        csr = self._ensure_csr()
+        out_degree = np.diff(csr.out_indptr)
+        edge_mask = np.repeat(out_degree < 2, out_degree)
+        _, labels = connected_components(
+            self._adjacency_matrix(edge_mask), directed=False
+        )
 
         # Extract subgraphs (aka tracklets) and return as new track graphs
-        tracklets = nx.weakly_connected_components(graph_copy)
+        node_ids = csr.node_ids
+        tracklets = [
+            {node_ids[i] for i in component} for component in _group_by_label(labels)
+        ]
 
         if include_division_edges:
-            tracklets = list(tracklets)
-            # Add back intertrack edges
-            for tracklet in tracklets:
-                for parent, daughter in removed_edges:
-                    if daughter in tracklet:
-                        tracklet.add(parent)
+            # Add back intertrack edges to the tracklet of each daughter
+            for parent in self.get_divisions():
+                for daughter in self.get_succs(parent):
+                    tracklets[labels[csr.node_index[daughter]]].add(parent)
 
         return [self.get_subgraph(g) for g in tracklets]
@@ -64,8 +64,8 @@ class CTCMatcher(Matcher):
         ):
             gt_frame = mask_gt[i]
             pred_frame = mask_pred[i]
-            gt_frame_nodes = gt.nodes_by_frame[t]
-            pred_frame_nodes = pred.nodes_by_frame[t]
+            gt_frame_nodes = gt.get_nodes_in_frame(t)
+            pred_frame_nodes = pred.get_nodes_in_frame(t)
 
             # get the labels for this frame
             gt_label_to_id = {
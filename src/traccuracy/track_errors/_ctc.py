@@ -65,8 +65,7 @@ def get_vertex_errors(matched_data: Matched):
             comp_graph.set_flag_on_node(pred_id, NodeFlag.FALSE_POS, False)
             # number of split operations that would be required to correct the vertices
             ns_count += len(gt_ids) - 1
-            for gt_id in gt_ids:
-                gt_graph.set_flag_on_node(gt_id, NodeFlag.FALSE_NEG, False)
+            gt_graph.set_flag_on_nodes(gt_ids, NodeFlag.FALSE_NEG, False)
 
     # Record presence of annotations on the TrackingGraph
     comp_graph.node_errors = True
@@ -84,8 +84,7 @@ def _classify_divisions(matched_data: Matched):
             div_pred.remove(pred_node)
 
     # Any remaining pred divisions are false positives
-    for fp_div in div_pred:
-        g_pred.set_flag_on_node(fp_div, NodeFlag.FP_DIV, True)
+    g_pred.set_flag_on_nodes(div_pred, NodeFlag.FP_DIV, True)
 
     # Set division annotation flag
     g_gt.division_annotations = True
@@ -1,3 +1,5 @@
+import copy
+import pickle
 from collections import Counter
 
 import networkx as nx
@@ -139,6 +141,84 @@ def test_get_cells_by_frame(simple_graph):
     assert Counter(simple_graph.nodes_by_frame[2]) == Counter(["1_2", "1_3"])
     # Test non-existent frame
     assert Counter(simple_graph.nodes_by_frame[5]) == Counter([])
+    # Test non-existent frame on derived graphs
+    subgraph = simple_graph.get_subgraph(["1_0", "1_1"])
+    assert Counter(subgraph.nodes_by_frame[2]) == Counter([])
+    (component,) = simple_graph.get_connected_components()
+    assert Counter(component.nodes_by_frame[5]) == Counter([])
+
+
+def test_get_nodes_in_frame(simple_graph):
+    assert simple_graph.get_nodes_in_frame(0) == {"1_0"}
+    assert simple_graph.get_nodes_in_frame(2) == {"1_2", "1_3"}
+    # Test non-existent frame does not add an entry to nodes_by_frame
+    assert simple_graph.get_nodes_in_frame(5) == set()
+    assert 5 not in simple_graph.nodes_by_frame
+
+
+def test_get_location(nx_comp1):
+    assert TrackingGraph(nx_comp1).get_location("1_3") == [2, 1]
+    assert TrackingGraph(nx_comp1, location_keys=("y", "x")).get_location("1_3") == [
+        1,
+        2,
+    ]
+    assert TrackingGraph(nx_comp1, location_keys=("x",)).get_location("1_3") == [2]
+
+
+def test_pickle_single_location_key(nx_comp1):
+    tracking_graph = TrackingGraph(nx_comp1, location_keys=("x",))
+    unpickled = pickle.loads(pickle.dumps(tracking_graph))
+    assert unpickled.get_location("1_3") == [2]
+    assert unpickled.get_location_array(["1_3"]).tolist() == [[2]]
+
+
+def test_get_location_array(simple_graph):
+    locations = simple_graph.get_location_array()
+    assert locations.shape == (5, 2)
+    for node, location in zip(simple_graph.nodes, locations):
+        assert list(location) == simple_graph.get_location(node)
+    assert simple_graph.get_location_array(["1_3", "1_0"]).tolist() == [
+        [2, 1],
+        [1, 1],
+    ]
+    assert simple_graph.get_location_array([]).shape == (0, 2)
+    with pytest.raises(KeyError):
+        simple_graph.get_location_array(["not_a_node"])
+
+
+def test_deepcopy_locations(simple_graph):
+    expected = simple_graph.locations.tolist()
+    for graph_copy in [
+        copy.deepcopy(simple_graph),
+        pickle.loads(pickle.dumps(simple_graph)),
+    ]:
+        # cached arrays are not copied but rebuilt read-only on first access
+        assert graph_copy._csr is None
+        assert graph_copy._locations is None
+        assert not graph_copy.locations.flags.writeable
+        assert graph_copy.locations.tolist() == expected
+    assert simple_graph._locations is not None
+
+
+def test_deepcopy_frame_index(complex_graph):
+    expected = complex_graph.get_node_indices_in_frame(2).tolist()
+    graph_copy = copy.deepcopy(complex_graph)
+    assert graph_copy._frame_nodes is None
+    indices = graph_copy.get_node_indices_in_frame(2)
+    assert not indices.flags.writeable
+    assert indices.tolist() == expected
+
+
+def test_get_node_indices_in_frame(complex_graph):
+    node_ids = list(complex_graph.nodes)
+    for frame in range(-1, 6):
+        indices = complex_graph.get_node_indices_in_frame(frame)
+        assert Counter(node_ids[i] for i in indices) == Counter(
+            complex_graph.get_nodes_in_frame(frame)
+        )
+    indices = complex_graph.get_node_indices_in_frame(3)
+    assert complex_graph.locations[indices].tolist() == [[2, 1], [1, 1], [1, 3]]
+    assert TrackingGraph(nx.DiGraph()).get_node_indices_in_frame(0).size == 0
 
 
 def test_get_nodes_with_flag(simple_graph):
@@ -159,10 +239,32 @@ def test_get_edges_with_flag(simple_graph):
         assert simple_graph.get_nodes_with_flag("is_tp")
 
 
+def test_get_preds(simple_graph, merge_graph):
+    assert simple_graph.get_preds("1_0") == []
+    assert simple_graph.get_preds("1_1") == ["1_0"]
+    assert Counter(merge_graph.get_preds("3_2")) == Counter(["3_1", "3_5"])
+
+
+def test_get_succs(simple_graph):
+    assert Counter(simple_graph.get_succs("1_1")) == Counter(["1_2", "1_3"])
+    assert simple_graph.get_succs("1_3") == ["1_4"]
+    assert simple_graph.get_succs("1_4") == []
+
+
 def test_get_divisions(complex_graph):
     assert complex_graph.get_divisions() == ["1_1", "2_2"]
 
 
+def test_get_divisions_cached(complex_graph):
+    divisions = complex_graph.get_divisions()
+    divisions.remove("1_1")
+    # modifying the returned list does not affect subsequent calls
+    assert complex_graph.get_divisions() == ["1_1", "2_2"]
+    # subgraphs do not inherit the cached divisions of the parent graph
+    subgraph = complex_graph.get_subgraph(["2_0", "2_1", "2_2", "2_3", "2_4"])
+    assert subgraph.get_divisions() == ["2_2"]
+
+
 def test_get_merges(merge_graph):
     assert merge_graph.get_merges() == ["3_2"]
 
@@ -182,6 +284,62 @@ def test_get_connected_components(complex_graph, nx_comp1, nx_comp2):
     assert track2.graph.edges == nx_comp2.edges
 
 
+def test_get_connected_components_flags(complex_graph):
+    complex_graph.set_flag_on_edge(("2_2", "2_3"), EdgeFlag.FALSE_POS)
+    tracks = complex_graph.get_connected_components()
+    track1, track2 = sorted(tracks, key=lambda track: "1_0" not in track.graph)
+    assert Counter(track1.nodes_by_flag[NodeFlag.TP_DIV]) == Counter(["1_1"])
+    assert Counter(track2.nodes_by_flag[NodeFlag.TP_DIV]) == Counter(["2_2"])
+    assert Counter(track1.edges_by_flag[EdgeFlag.TRUE_POS]) == Counter([("1_0", "1_1")])
+    assert Counter(track1.edges_by_flag[EdgeFlag.FALSE_POS]) == Counter([])
+    assert Counter(track2.edges_by_flag[EdgeFlag.FALSE_POS]) == Counter(
+        [("2_2", "2_3")]
+    )
+    assert track1.nodes_by_frame == {
+        0: {"1_0"},
+        1: {"1_1"},
+        2: {"1_2", "1_3"},
+        3: {"1_4"},
+    }
+    assert (track2.start_frame, track2.end_frame) == (0, 4)
+
+
+def test_flag_index_built_on_first_access(nx_comp1):
+    tracking_graph = TrackingGraph(nx_comp1)
+    assert tracking_graph._nodes_by_flag is None
+    assert tracking_graph._edges_by_flag is None
+    # flags written directly to the networkx graph before first access are indexed
+    tracking_graph.graph.nodes["1_0"][NodeFlag.FALSE_POS] = True
+    tracking_graph.graph.edges["1_3", "1_4"][EdgeFlag.FALSE_POS] = True
+    assert Counter(tracking_graph.nodes_by_flag[NodeFlag.FALSE_POS]) == Counter(["1_0"])
+    assert Counter(tracking_graph.edges_by_flag[EdgeFlag.FALSE_POS]) == Counter(
+        [("1_3", "1_4")]
+    )
+
+
+def test_set_flag_index(nx_comp1):
+    tracking_graph = TrackingGraph(nx_comp1)
+    nodes_by_flag = {NodeFlag.FALSE_POS: {"1_0"}}
+    tracking_graph.nodes_by_flag = nodes_by_flag
+    assert tracking_graph.nodes_by_flag is nodes_by_flag
+    # the edge mapping is still built lazily without replacing the assigned nodes
+    assert Counter(tracking_graph.edges_by_flag[EdgeFlag.TRUE_POS]) == Counter(
+        [("1_0", "1_1")]
+    )
+    assert tracking_graph.nodes_by_flag is nodes_by_flag
+
+
+def test_get_connected_components_unindexed_flags(nx_comp1, nx_comp2):
+    tracking_graph = TrackingGraph(nx.compose(nx_comp1, nx_comp2))
+    assert tracking_graph._nodes_by_flag is None
+    tracks = tracking_graph.get_connected_components()
+    track1, track2 = sorted(tracks, key=lambda track: "1_0" not in track.graph)
+    assert Counter(track1.nodes_by_flag[NodeFlag.TP_DIV]) == Counter(["1_1"])
+    assert Counter(track2.nodes_by_flag[NodeFlag.TP_DIV]) == Counter(["2_2"])
+    assert Counter(track1.edges_by_flag[EdgeFlag.TRUE_POS]) == Counter([("1_0", "1_1")])
+    assert Counter(track2.edges_by_flag[EdgeFlag.TRUE_POS]) == Counter([])
+
+
 def test_get_subgraph(simple_graph):
     target_nodes = ("1_0", "1_1")
     subgraph = simple_graph.get_subgraph(target_nodes)
@@ -195,6 +353,18 @@ def test_get_subgraph(simple_graph):
     # test that start and end frame are updated
     assert subgraph.start_frame == 0
     assert subgraph.end_frame == 2
+    # test that modifying the subgraph does not modify the original graph
+    subgraph.set_flag_on_node("1_0", NodeFlag.FALSE_POS)
+    assert NodeFlag.FALSE_POS not in simple_graph.nodes["1_0"]
+    assert "1_0" not in simple_graph.nodes_by_flag[NodeFlag.FALSE_POS]
+
+    # test that flagged edges with an endpoint outside the subgraph are dropped
+    simple_graph.set_flag_on_all_edges(EdgeFlag.FALSE_NEG)
+    subgraph = simple_graph.get_subgraph(["1_1", "1_3", "1_4"])
+    assert Counter(subgraph.edges_by_flag[EdgeFlag.FALSE_NEG]) == Counter(
+        [("1_1", "1_3"), ("1_3", "1_4")]
+    )
+    assert Counter(subgraph.edges_by_flag[EdgeFlag.TRUE_POS]) == Counter([])
 
     # test empty target nodes
     empty_graph = simple_graph.get_subgraph([])
@@ -247,6 +417,25 @@ def test_set_flag_on_node(simple_graph):
         simple_graph.set_flag_on_node("1_0", "x", 2)
 
 
+def test_set_flag_on_nodes(simple_graph):
+    simple_graph.set_flag_on_nodes(["1_0", "1_2"], NodeFlag.FALSE_POS)
+    assert simple_graph.nodes["1_0"][NodeFlag.FALSE_POS] is True
+    assert simple_graph.nodes["1_2"][NodeFlag.FALSE_POS] is True
+    assert NodeFlag.FALSE_POS not in simple_graph.nodes["1_3"]
+    assert Counter(simple_graph.nodes_by_flag[NodeFlag.FALSE_POS]) == Counter(
+        ["1_0", "1_2"]
+    )
+
+    simple_graph.set_flag_on_nodes(["1_2"], NodeFlag.FALSE_POS, value=False)
+    assert simple_graph.nodes["1_2"][NodeFlag.FALSE_POS] is False
+    assert Counter(simple_graph.nodes_by_flag[NodeFlag.FALSE_POS]) == Counter(["1_0"])
+
+    with pytest.raises(ValueError):
+        simple_graph.set_flag_on_nodes(["1_0"], "is_fp")
+    with pytest.raises(KeyError):
+        simple_graph.set_flag_on_nodes(["not_a_node"], NodeFlag.FALSE_POS)
+
+
 def test_set_flag_on_edge(simple_graph):
     edge_id = ("1_1", "1_3")
     assert EdgeFlag.TRUE_POS not in simple_graph.edges()[edge_id]
@@ -289,3 +478,54 @@ def test_get_tracklets(simple_graph):
             assert end_nodes[0] == "1_2"
         elif start_nodes[0] == "1_3":
             assert end_nodes[0] == "1_4"
+
+
+def test_get_tracklets_division_edges(complex_graph):
+    tracklets = complex_graph.get_tracklets()
+    assert Counter(frozenset(t.nodes) for t in tracklets) == Counter(
+        [
+            frozenset(["1_0", "1_1"]),
+            frozenset(["1_2"]),
+            frozenset(["1_3", "1_4"]),
+            frozenset(["2_0", "2_1", "2_2"]),
+            frozenset(["2_3"]),
+            frozenset(["2_4"]),
+        ]
+    )
+
+    tracklets = complex_graph.get_tracklets(include_division_edges=True)
+    assert Counter(frozenset(t.nodes) for t in tracklets) == Counter(
+        [
+            frozenset(["1_0", "1_1"]),
+            frozenset(["1_1", "1_2"]),
+            frozenset(["1_1", "1_3", "1_4"]),
+            frozenset(["2_0", "2_1", "2_2"]),
+            frozenset(["2_2", "2_3"]),
+            frozenset(["2_2", "2_4"]),
+        ]
+    )
+    # computing tracklets does not modify the cached topology
+    assert complex_graph.get_divisions() == ["1_1", "2_2"]
+
+
+def test_get_tracklets_consecutive_divisions():
+    """Daughter b of division a divides again in the next frame.
+
+    a -> b, a -> c, b -> d, b -> e
+    """
+    graph = nx.DiGraph()
+    # node order is chosen so that the daughter comes before its parent
+    for node, t in [("b", 1), ("a", 0), ("c", 1), ("d", 2), ("e", 2)]:
+        graph.add_node(node, t=t, x=0, y=0)
+    graph.add_edges_from([("a", "b"), ("a", "c"), ("b", "d"), ("b", "e")])
+    tracklets = TrackingGraph(graph).get_tracklets(include_division_edges=True)
+    # each tracklet only gains its direct parent, not the parent's parent
+    assert Counter(frozenset(t.nodes) for t in tracklets) == Counter(
+        [
+            frozenset(["a"]),
+            frozenset(["a", "b"]),
+            frozenset(["a", "c"]),
+            frozenset(["b", "d"]),
+            frozenset(["b", "e"]),
+        ]
+    )